@@ -0,0 +1,174 @@
+import argparse
+import asyncio
+import time
+import aioboto3
+import boto3
+import orjson
+import os
+from proposal_bedrock import (
+    AWS_SESSION_KWARGS,
+    BEDROCK_CLIENT_CONFIG,
+    MODEL_ID,
+    PROPOSAL_MAX_TOKENS,
+    PROPOSAL_TOOL,
+    PROPOSAL_PROMPT,
+    TRUNCATED_OUTPUT_ERROR,
+    converse_request,
+    tool_input,
+)
+
+# Non-interactive proposal generation for many inputs (CLI / nightly regeneration).
+# Usage: python bulk_proposals.py customer_requirements.txt [--batch] > proposals.jsonl
+# The input file holds one customer requirement per line; the output has one JSON proposal per line.
+# By default proposals are generated concurrently over the async client; --batch submits a Bedrock
+# batch inference job instead (cheaper for large runs, but queued and slow).
+
+# Upper bound on concurrent Bedrock requests issued by the async path
+MAX_PARALLEL_REQUESTS = int(os.getenv("bedrock_max_parallel_requests", "10"))
+
+# S3 bucket and IAM service role used by Bedrock batch inference jobs
+BATCH_BUCKET = os.getenv("bedrock_batch_bucket")
+BATCH_ROLE_ARN = os.getenv("bedrock_batch_role_arn")
+BATCH_POLL_SECONDS = 60
+# Bedrock rejects batch inference jobs with fewer records than this
+BATCH_MIN_RECORDS = 100
+
+
+async def generate_proposal_async(client, user_input):
+    """Generate a tailored financial proposal using an async (aioboto3) Bedrock client."""
+    try:
+        response = await client.converse(
+            **converse_request(PROPOSAL_PROMPT, "User Input: " + user_input, PROPOSAL_TOOL, PROPOSAL_MAX_TOKENS)
+        )
+        return tool_input(response)
+    except Exception as e:
+        return {"error": f"Exception occurred: {str(e)}"}
+
+
+async def generate_proposals_async(user_inputs):
+    """Generate proposals for several inputs concurrently, with at most MAX_PARALLEL_REQUESTS in flight."""
+    semaphore = asyncio.Semaphore(MAX_PARALLEL_REQUESTS)
+    session = aioboto3.Session(**AWS_SESSION_KWARGS)
+    async with session.client(service_name="bedrock-runtime", config=BEDROCK_CLIENT_CONFIG) as client:
+        async def generate(user_input):
+            async with semaphore:
+                return await generate_proposal_async(client, user_input)
+
+        return await asyncio.gather(*(generate(user_input) for user_input in user_inputs))
+
+
+def generate_proposals(user_inputs):
+    """Synchronous entry point for generating many proposals over the async client."""
+    return asyncio.run(generate_proposals_async(user_inputs))
+
+
+def batch_model_input(user_input):
+    """Build the native Anthropic request body for one proposal in a batch inference job."""
+    return {
+        "anthropic_version": "bedrock-2023-05-31",
+        "max_tokens": PROPOSAL_MAX_TOKENS,
+        "temperature": 0,
+        "system": PROPOSAL_PROMPT,
+        "messages": [{"role": "user", "content": "User Input: " + user_input}],
+        "tools": [{
+            "name": PROPOSAL_TOOL["name"],
+            "description": PROPOSAL_TOOL["description"],
+            "input_schema": PROPOSAL_TOOL["inputSchema"]["json"],
+        }],
+        "tool_choice": {"type": "tool", "name": PROPOSAL_TOOL["name"]},
+    }
+
+
+def batch_record_result(record):
+    """Extract the proposal (or an error) from one record of a batch job's output."""
+    if "modelOutput" not in record:
+        return {"error": record.get("error", {}).get("errorMessage", "No output for this record")}
+    if record["modelOutput"].get("stop_reason") == "max_tokens":
+        # The tool input was cut off mid-generation, so don't pass it on as a proposal
+        return {"error": TRUNCATED_OUTPUT_ERROR}
+    for block in record["modelOutput"].get("content", []):
+        if block.get("type") == "tool_use":
+            return block["input"]
+    return {"error": "No proposal in model output"}
+
+
+def batch_generate_proposals(user_inputs, job_name=None):
+    """
+    Generate proposals for many inputs with a Bedrock batch inference job.
+    Jobs are queued by AWS and can take hours, so this blocks until the job finishes.
+    Returns one proposal (or error dict) per input, in input order.
+    """
+    # Validate before touching S3, so bad settings fail fast with a clear message
+    if not BATCH_BUCKET or not BATCH_ROLE_ARN:
+        raise ValueError("Set bedrock_batch_bucket and bedrock_batch_role_arn to run a batch inference job")
+    if len(user_inputs) < BATCH_MIN_RECORDS:
+        raise ValueError(
+            f"Batch inference needs at least {BATCH_MIN_RECORDS} inputs (got {len(user_inputs)}); "
+            "use the async path for smaller runs"
+        )
+
+    aws_session = boto3.Session(**AWS_SESSION_KWARGS)
+    s3_client = aws_session.client(service_name="s3")
+    bedrock = aws_session.client(service_name="bedrock")
+
+    job_name = job_name or f"proposals-{int(time.time())}"
+    input_key = f"{job_name}/input.jsonl"
+    output_prefix = f"{job_name}/output/"
+
+    # Write the JSONL manifest, one record per prompt; the record id is the input index
+    manifest = b"\n".join(
+        orjson.dumps({"recordId": f"{index:011d}", "modelInput": batch_model_input(user_input)})
+        for index, user_input in enumerate(user_inputs)
+    )
+    s3_client.put_object(Bucket=BATCH_BUCKET, Key=input_key, Body=manifest)
+
+    job_arn = bedrock.create_model_invocation_job(
+        jobName=job_name,
+        roleArn=BATCH_ROLE_ARN,
+        modelId=MODEL_ID,
+        inputDataConfig={"s3InputDataConfig": {"s3Uri": f"s3://{BATCH_BUCKET}/{input_key}"}},
+        outputDataConfig={"s3OutputDataConfig": {"s3Uri": f"s3://{BATCH_BUCKET}/{output_prefix}"}},
+    )["jobArn"]
+
+    # Poll until the job finishes
+    while True:
+        status = bedrock.get_model_invocation_job(jobIdentifier=job_arn)["status"]
+        if status in ("Completed", "PartiallyCompleted"):
+            break
+        if status in ("Failed", "Stopped", "Expired"):
+            raise RuntimeError(f"Batch job {job_name} ended with status {status}")
+        time.sleep(BATCH_POLL_SECONDS)
+
+    # Bedrock writes the results to <output prefix>/<job id>/<input file name>.out
+    job_id = job_arn.split("/")[-1]
+    output = s3_client.get_object(Bucket=BATCH_BUCKET, Key=f"{output_prefix}{job_id}/input.jsonl.out")
+
+    results = [{"error": "No output for this record"} for _ in user_inputs]
+    for line in output["Body"].read().splitlines():
+        if line.strip():
+            record = orjson.loads(line)
+            results[int(record["recordId"])] = batch_record_result(record)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate financial proposals for many customer requirements.")
+    parser.add_argument("input_file", help="Text file with one customer requirement per line")
+    parser.add_argument("--batch", action="store_true", help="Use a Bedrock batch inference job")
+    parser.add_argument("--job-name", help="Name of the batch inference job (defaults to a timestamped name)")
+    args = parser.parse_args()
+
+    with open(args.input_file, encoding="utf-8") as input_file:
+        user_inputs = [line.strip() for line in input_file if line.strip()]
+
+    if args.batch:
+        proposals = batch_generate_proposals(user_inputs, job_name=args.job_name)
+    else:
+        proposals = generate_proposals(user_inputs)
+
+    for proposal in proposals:
+        print(orjson.dumps(proposal).decode())
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
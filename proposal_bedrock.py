@@ -0,0 +1,181 @@
+import os
+from botocore.config import Config
+from dotenv import load_dotenv
+
+# Bedrock settings, tool schemas and prompts shared by the Streamlit app (Conversational_proposal.py)
+# and the non-interactive bulk runner (bulk_proposals.py). Nothing here imports Streamlit.
+
+# Load environment variables
+load_dotenv()
+
+# AWS settings shared by the sync (boto3) and async (aioboto3) Bedrock clients
+AWS_SESSION_KWARGS = {
+    "aws_access_key_id": os.getenv("AWS_ACCESS_KEY_ID"),
+    "aws_secret_access_key": os.getenv("AWS_SECRET_ACCESS_KEY"),
+    "region_name": os.getenv("aws_secret_region"),
+}
+BEDROCK_CLIENT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+)
+
+# Bedrock model settings. Set bedrock_performance_latency to "optimized" only with a model
+# (or inference profile) and region that offer latency-optimized inference.
+MODEL_ID = os.getenv("bedrock_model_id", "anthropic.claude-3-5-sonnet-20240620-v1:0")
+PERFORMANCE_LATENCY = os.getenv("bedrock_performance_latency", "standard")
+
+# Output token budgets, sized to the tool schemas rather than free-form text. A fully populated
+# proposal (300-word description, every list item selected, all provided details) measures about
+# 820 tokens; a full analyze result about 170. Both budgets leave headroom above that.
+PROPOSAL_MAX_TOKENS = 1200
+ANALYZE_MAX_TOKENS = 300
+
+TRUNCATED_OUTPUT_ERROR = "Model output was truncated at the max_tokens limit"
+
+# List of required lead details
+REQUIRED_LEAD_DETAILS = {
+    "Annual Revenue": "What is the approximate annual revenue of your business?",
+    "Industry": "Which industry does your business operate in?",
+    "Entity Type": "What is the entity type of your business (e.g., LLC, Corporation)?",
+    "Publicly Traded": "Is your business publicly traded or privately held?",
+    "Primary Accounting Software": "What is the primary accounting software your business uses (e.g., QuickBooks, Xero)?",
+    "Months to Clean-Up": "How many months of bookkeeping clean-up are needed?",
+    "Year to Be Filed": "Which financial year do you want to file taxes for?",
+    "States to File Taxes": "Which states do you need to file taxes in?",
+}
+
+# Required lead detail keys, frozen once for ordered iteration and membership tests
+REQUIRED_KEY_TUPLE = tuple(REQUIRED_LEAD_DETAILS)
+REQUIRED_KEY_SET = frozenset(REQUIRED_KEY_TUPLE)
+
+# Tool schemas that constrain the model output to the JSON the app consumes
+PROVIDED_DETAILS_SCHEMA = {
+    "type": "object",
+    "description": "All extracted lead details, keyed by lead detail name.",
+    "properties": {key: {"type": "string"} for key in REQUIRED_KEY_TUPLE},
+}
+
+ANALYZE_TOOL = {
+    "name": "emit_lead_details",
+    "description": "Record the lead details found in the inputs and the required ones that are still missing.",
+    "inputSchema": {
+        "json": {
+            "type": "object",
+            "properties": {
+                "provided_details": PROVIDED_DETAILS_SCHEMA,
+                "missing_details": {
+                    "type": "array",
+                    "description": "Required lead details that were not provided.",
+                    "items": {"type": "string", "enum": list(REQUIRED_KEY_TUPLE)},
+                },
+            },
+            "required": ["provided_details", "missing_details"],
+        }
+    },
+}
+
+PROPOSAL_TOOL = {
+    "name": "emit_proposal",
+    "description": "Record the summary proposal built from the customer's requirements.",
+    "inputSchema": {
+        "json": {
+            "type": "object",
+            "properties": {
+                "Proposal Description": {"type": "string"},
+                "Required Services": {"type": "array", "items": {"type": "string"}},
+                "Required Skills": {"type": "array", "items": {"type": "string"}},
+                "Required Certifications": {"type": "array", "items": {"type": "string"}},
+                "Required Software": {"type": "string"},
+                "Required Service Line": {"type": "array", "items": {"type": "string"}},
+                "Required Language": {"type": "string"},
+                "Required Location and Time Zones": {"type": "string"},
+                "Required Teams": {"type": "string"},
+                "Start/End Dates": {"type": "string"},
+                "provided_details": PROVIDED_DETAILS_SCHEMA,
+            },
+            "required": [
+                "Proposal Description",
+                "Required Services",
+                "Required Skills",
+                "Required Certifications",
+                "Required Software",
+                "Required Service Line",
+                "Required Language",
+                "Required Location and Time Zones",
+                "Required Teams",
+                "Start/End Dates",
+                "provided_details",
+            ],
+        }
+    },
+}
+
+# Static proposal instructions, sent as the system prompt
+PROPOSAL_PROMPT = """You are FinancialExpertAI, assigned to create a detailed SUMMARY PROPOSAL based on the provided requirements.
+Your task includes identifying the specific services, required skills, and relevant certifications from the given lists.
+The summary should be thorough, precise, and tailored to the mentioned requirements and available options.
+Required Services:
+- Bookkeeping Clean Up
+- Accounting Advisory
+- Monthly Bookkeeping Support
+- Implementation of Accounting Software
+- Tax Filing
+- Tax Preparation
+- Basic Monthly Bookkeeping Support
+- Premium Monthly Bookkeeping Support
+- Plus Monthly Bookkeeping Support
+Required Skills:
+- Tax Filing
+- Accounting
+- Auditing
+- Financial Analysis & Management
+- Data & Analytics
+- Compliance & Regulation
+- Soft Skills & General Management
+Required Certificates:
+- Accredited in Business Valuations (ABV)
+- Certified Public Accountant (CPA)
+- Chartered Financial Analyst (CFA)
+Required Service Lines:
+- Tax Preparation
+- CPA/Accounting Advisory
+- Full Charge Bookkeeping
+- FP&A
+- CFO
+Instructions:
+- **Proposal Description:** Summarize the customer's requirements within this heading. Ensure that all provided information is addressed without adding anything extra.
+- **Required Services:** From the list of available services, identify the specific services needed based on the customer's requirements. Present this as a list.
+- **Required Skills:** Identify the required skills that correspond to the selected services. Present this as a list.
+- **Required Certifications:** Identify the necessary certifications from the provided list based on the identified services and skills. Present this as a list.
+- **Required Software:** Mention any software requirements if specified by the client. If not mentioned, state 'Not Mentioned'.
+- **Required Service Line:** From the list of Required Service Lines, identify the specific services needed based on the customer's requirements. Present this as a list.
+- **Required Language:** Mention any Language requirements if specified by the client. If not mentioned, state 'Not Mentioned'.
+- **Required Location and Time Zones:** Mention any location, time zone, or location radius if specified by the client. If not mentioned, state 'Not Mentioned'.
+- **Required Teams:** Mention any Teams requirements if specified by the client. If not mentioned, state 'Not Mentioned'.
+- **Start/End Dates:** Mention any Start/End Dates or any Timeline requirements if specified by the client. If not mentioned, state 'Not Mentioned'.
+- **Provided Details:** Extract any of the required lead details (""" + ", ".join(REQUIRED_KEY_TUPLE) + """) given in the customer's requirements. Leave out details that are not mentioned.
+Return the proposal by calling the emit_proposal tool."""
+
+
+def converse_request(system_prompt, user_text, tool_spec, max_tokens):
+    """Build the Converse API arguments for a call that is forced to answer with a single tool."""
+    return {
+        "modelId": MODEL_ID,
+        # Static instructions go in the system block, separate from the per-request text
+        "system": [{"text": system_prompt}],
+        "messages": [{"role": "user", "content": [{"text": user_text}]}],
+        "inferenceConfig": {"maxTokens": max_tokens, "temperature": 0},
+        "toolConfig": {
+            "tools": [{"toolSpec": tool_spec}],
+            "toolChoice": {"tool": {"name": tool_spec["name"]}},
+        },
+        "performanceConfig": {"latency": PERFORMANCE_LATENCY},
+    }
+
+
+def tool_input(response):
+    """Extract the forced tool call's input from a Converse response."""
+    if response["stopReason"] == "max_tokens":
+        raise ValueError(TRUNCATED_OUTPUT_ERROR)
+    # A forced tool choice makes the tool call the first (and only) content block
+    return response["output"]["message"]["content"][0]["toolUse"]["input"]
\ No newline at end of file